@@ -1,16 +1,23 @@
 #!/usr/bin/env python
 
 import argparse
+import importlib
+import os
 import sys
 
 from scripts import (
-    bin2timeseries,
     init_deployment,
-    copy_delayed_files,
     check_config_files,
     generate_deploymentyaml,
 )
 
+# binary conversion pipelines, imported only when selected since they load pyglider
+PIPELINES = {
+    "bin2timeseries": "scripts.bin2timeseries",
+    "bin2profiles": "scripts.bin2profiles",
+    "bin2raw": "scripts.bin2raw",
+}
+
 
 def main(args):
 
@@ -31,12 +38,15 @@ def main(args):
     if args.mode == "delayed":
         # the decompression step isn't really necessary with this version, but it's here in case other functions are added.
         print("Decompressing delayed mode binary files...", end=" ", flush=True)
+        from scripts import copy_delayed_files
+
         copy_delayed_files.main(args)
         print("Done!")
 
-    # convert binary data to raw netcdf timeseries
+    # convert binary data to raw netcdfs with the selected pipeline
     print("Converting binary data to raw netcdfs...", end=" ", flush=True)
-    raw_dict = bin2timeseries.main(args)
+    pipeline = importlib.import_module(PIPELINES[args.pipeline])
+    raw_dict = pipeline.main(args)
     print("Done!")
 
     # run qc on raw netcdfs
@@ -97,6 +107,46 @@ if __name__ == "__main__":
         default=120,
     )
 
+    arg_parser.add_argument(
+        "-ms",
+        "--min_samples",
+        help="Minimum samples to be included in a profile (bin2profiles)",
+        type=int,
+        default=75,
+    )
+
+    arg_parser.add_argument(
+        "-gt",
+        "--gap_threshold",
+        help="Minimum gap in seconds in a profile to be considered a gap (bin2profiles)",
+        type=int,
+        default=30,
+    )
+
+    arg_parser.add_argument(
+        "-p",
+        "--pipeline",
+        help="Binary conversion pipeline to run",
+        choices=list(PIPELINES),
+        default="bin2timeseries",
+    )
+
+    arg_parser.add_argument(
+        "-n",
+        "--cores",
+        help="Number of deployments to convert in parallel (bin2raw, bin2profiles)",
+        type=int,
+        default=max(1, int((os.cpu_count() or 1) * 0.8)),
+    )
+
+    arg_parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of delayed mode binary files to copy at once",
+        type=int,
+        default=8,
+    )
+
     arg_parser.add_argument(
         "-test",
         "--test",
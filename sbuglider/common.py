@@ -1,46 +1,98 @@
 #!/usr/bin/env python
 
+import glob
 import sys
-from dateutil import parser
 import os
 import logging
-import pytz
+import mmap
 import re
+import shutil
 import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 
-from netCDF4 import default_fillvals
-from netCDF4 import num2date
-import pandas as pd
-import xarray as xr
+from sbuglider.loggers import close_logger, logfile_deploymentname, setup_logger
+
+# glider deployment names are formatted as glider-YYYYmmddTHHMM
+_GLIDER_RE = re.compile(r"^(.*)-(\d{8}T\d{4})")
+
+# binary/raw netcdf data subdirectory for each dataset mode
+_MODEMAP = {"delayed": "debd", "rt": "stbd"}
+
+# in-kernel copy calls for fast_copy, in order of preference, as (infd, outfd, count) -> copied
+_KERNEL_COPIES = []
+if hasattr(os, "copy_file_range"):
+    _KERNEL_COPIES.append(
+        lambda infd, outfd, count: os.copy_file_range(infd, outfd, count)
+    )
+if hasattr(os, "sendfile"):
+    _KERNEL_COPIES.append(
+        lambda infd, outfd, count: os.sendfile(outfd, infd, None, count)
+    )
+
+# messages for output directories that check_deployment_datapaths can't find, by output type
+_MISSING_OUTPUT_DIR = {
+    "rawnc": "%s raw NetCDF output file data directory not found",
+    "out": "%s output file data directory not found",
+}
+
+# userspace fallbacks for fast_copy: memory map files larger than the threshold, otherwise use a buffer
+_MMAP_COPY_THRESHOLD = 1024 * 1024
+_COPY_BUFSIZE = 1024 * 1024
+
+# season of each month, January first
+_SEASONS = (
+    "DJF",
+    "DJF",
+    "MAM",
+    "MAM",
+    "MAM",
+    "JJA",
+    "JJA",
+    "JJA",
+    "SON",
+    "SON",
+    "SON",
+    "DJF",
+)
+
+# time units that can be converted directly from epoch seconds, e.g. "seconds since 1970-01-01T00:00:00Z"
+_EPOCH_SECONDS_RE = re.compile(
+    r"^seconds since 1970-01-01(?:[ T]00:00(?::00(?:\.0*)?)?)?\s*(?:Z|UTC|\+00:?00)?$"
+)
 
 
 def convert_epoch_ts(data):
     """Converts a time variable to a datetime object."""
     # originally written by lgarzio: https://github.com/lgarzio/ruglider_processing/blob/master/ruglider_processing/common.py
-    if isinstance(data, xr.core.dataarray.DataArray):
-        time = pd.to_datetime(
-            num2date(data.values, data.units, only_use_cftime_datetimes=False)
-        )
-    elif isinstance(data, pd.core.indexes.base.Index):
-        time = pd.to_datetime(
-            num2date(
-                data,
-                "seconds since 1970-01-01T00:00:00Z",
-                only_use_cftime_datetimes=False,
-            )
-        )
-    elif isinstance(data, pd.core.indexes.datetimes.DatetimeIndex):
-        time = pd.to_datetime(
-            num2date(
-                data,
-                "seconds since 1970-01-01T00:00:00Z",
-                only_use_cftime_datetimes=False,
-            )
-        )
+    # the numeric stack is imported here so that the path and logging helpers load quickly
+    from netCDF4 import num2date
+    import numpy as np
+    import pandas as pd
+
+    # DataArrays carry their time units, indexes and arrays are seconds since 1970-01-01T00:00:00Z
+    units = getattr(data, "units", "seconds since 1970-01-01T00:00:00Z")
+    values = np.asarray(data)
+
+    if values.dtype.kind == "M":
+        # already datetime64
+        time = pd.to_datetime(values)
+    elif _EPOCH_SECONDS_RE.match(units.strip()):
+        # vectorized conversion, num2date builds a datetime object per element
+        time = pd.to_datetime(values, unit="s")
+    else:
+        time = pd.to_datetime(num2date(values, units, only_use_cftime_datetimes=False))
 
     return time
 
 
+def _log_stream(stream, log, name):
+    """Logs each line from a subprocess output stream as it is written."""
+    for line in stream:
+        log("%s: %s", name, line.rstrip())
+
+
 def decompress_dbds(
     logger,
     indir,
@@ -62,34 +114,45 @@ def decompress_dbds(
         script (str): absolute path to decompress_dbds.sh
     """
     script = os.path.expanduser(script)
-    logger.debug(f"script: {script}")
+    logger.debug("script: %s", script)
 
     if os.path.exists(script) == False:
-        logger.error(f"Decompression script not found: {script}")
+        logger.error("Decompression script not found: %s", script)
         sys.exit(1)
 
+    # the script is run from the root of the slocum repository
     repo_root = os.path.dirname(os.path.dirname(script))
-    script_relpath = os.path.relpath(script, repo_root)
-    logger.debug(f"repo_root: {repo_root}")
-    logger.debug(f"script_relpath: {script_relpath}")
+    logger.debug("repo_root: %s", repo_root)
 
     if outdir is None:
         outdir = indir
 
-    cmd = f"{script_relpath} -o {outdir} {indir}/*{suffix}"
-    logger.debug(f"cmd: {cmd}")
-    result = subprocess.run(
+    files = sorted(glob.glob(os.path.join(indir, f"*{suffix}")))
+    if not files:
+        logger.warning("No *%s files found in %s", suffix, indir)
+        return
+
+    cmd = [script, "-o", outdir, *files]
+    logger.debug("cmd: %s", " ".join(cmd))
+    with subprocess.Popen(
         cmd,
         cwd=repo_root,
-        shell=True,
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
         text=True,
-    )
+        bufsize=1,
+    ) as proc:
+        # log stderr from a separate thread so neither pipe can fill up and block the script
+        stderr_thread = threading.Thread(
+            target=_log_stream, args=(proc.stderr, logger.error, "stderr")
+        )
+        stderr_thread.start()
+        _log_stream(proc.stdout, logger.info, "stdout")
+        stderr_thread.join()
+        returncode = proc.wait()
 
-    logger.info(f"stdout: {result.stdout}")
-    logger.error(f"stderr: {result.stderr}")
-    if result.returncode != 0:
-        logger.error(f"Decompression failed with code {result.returncode}")
+    if returncode != 0:
+        logger.error("Decompression failed with code %s", returncode)
         sys.exit(1)
     else:
         logger.info("Decompression completed successfully.")
@@ -115,43 +178,31 @@ def find_glider_deployment_datapath(
     """
     # originally written by lgarzio: https://github.com/lgarzio/ruglider_processing/blob/master/ruglider_processing/common.py
 
-    # Pre-compile regex pattern to extract glider and trajectory from deployment name
-    glider_regex = re.compile(r"^(.*)-(\d{8}T\d{4})")
-
     # Extract glider and trajectory from deployment name
-    match = glider_regex.search(deployment)
+    match = _GLIDER_RE.match(deployment)
     if match:
         glider, trajectory = match.groups()
 
-        # Parse trajectory date
-        try:
-            # Convert trajectory string into a datetime object
-            trajectory_dt = parser.parse(trajectory).replace(tzinfo=pytz.UTC)
-        except ValueError as e:
-            logger.error(f"Error parsing trajectory date {deployment}: {e}")
+        # Set the deployment binary data path
+        modemap = _MODEMAP.get(mode)
+        if modemap is None:
+            logger.warning("%s invalid mode provided: %s", deployment, mode)
             return None, None, None, None
 
+        # the regex guarantees a YYYYmmddTHHMM trajectory, so the year is the first 4 characters
+        deployment_year = trajectory[:4]
+
         # Create fully-qualified path to the deployment location
-        deployment_year = "{:0.0f}".format(trajectory_dt.year)
         deployment_location = os.path.join(
             deployments_root, deployment_year, deployment
         )
 
-        # Set the deployment binary data path
-        if mode == "delayed":
-            modemap = "debd"
-        elif mode == "rt":
-            modemap = "stbd"
-        else:
-            logger.warning(f"{deployment} invalid mode provided: {mode}")
-            return None, None, None, None
-
         # Create fully-qualified path to the binary data
         data_path = os.path.join(deployment_location, "data", "in", "binary", modemap)
 
         # Check if directory exists
         if not os.path.isdir(data_path):
-            logger.warning(f"{deployment} data directory not found: {data_path}")
+            logger.warning("%s data directory not found: %s", deployment, data_path)
             return None, None, None, None
 
         # Set the deployment raw netcdf data path
@@ -162,7 +213,7 @@ def find_glider_deployment_datapath(
 
         return data_path, nc_outpath, outdir, deployment_location
     else:
-        logger.error(f"Cannot pull glider name from {deployment}")
+        logger.error("Cannot pull glider name from %s", deployment)
         return None, None, None, None
 
 
@@ -180,41 +231,28 @@ def find_glider_deployment_location(logger, deployment, deployments_root):
         - deployment_location (str): glider deployment location.
     """
     # originally written by lgarzio: https://github.com/lgarzio/ruglider_processing/blob/master/ruglider_processing/common.py
-    glider_regex = re.compile(r"^(.*)-(\d{8}T\d{4})")
-    match = glider_regex.search(deployment)
+    match = _GLIDER_RE.match(deployment)
     if match:
-        # Parse trajectory date
-        try:
-            glider, trajectory = match.groups()
-            try:
-                trajectory_dt = parser.parse(trajectory).replace(tzinfo=pytz.UTC)
-            except ValueError as e:
-                logger.error(
-                    "Error parsing trajectory date {:s}: {:}".format(trajectory, e)
-                )
-                return None
-
-            deployment_year = "{:0.0f}".format(trajectory_dt.year)
-
-            # Create fully-qualified path to the deployment location
-            deployment_location = os.path.join(
-                deployments_root, deployment_year, deployment
-            )
+        glider, trajectory = match.groups()
 
-            # Check if directory exists
-            if os.path.isdir(deployment_location):
-                logger.debug(f"Deployment location found: {deployment_location}")
-            else:
-                logger.warning(
-                    f"Deployment location does not exist: {deployment_location}"
-                )
-                return None
+        # the regex guarantees a YYYYmmddTHHMM trajectory, so the year is the first 4 characters
+        deployment_year = trajectory[:4]
 
-        except ValueError as e:
-            logger.error(f"Error parsing invalid deployment name {deployment}: {e}")
+        # Create fully-qualified path to the deployment location
+        deployment_location = os.path.join(
+            deployments_root, deployment_year, deployment
+        )
+
+        # Check if directory exists
+        if os.path.isdir(deployment_location):
+            logger.debug("Deployment location found: %s", deployment_location)
+        else:
+            logger.warning(
+                "Deployment location does not exist: %s", deployment_location
+            )
             return None
     else:
-        logger.error(f"Cannot pull glider name from {deployment}")
+        logger.error("Cannot pull glider name from %s", deployment)
         return None
 
     return deployment_location
@@ -241,33 +279,338 @@ def find_glider_deployments_rootdir(
     data_home = os.getenv(envvar)
 
     if not data_home:
-        logger.error("{:s} not set".format(envvar))
+        logger.error("%s not set", envvar)
         return 1, 1
     elif not os.path.isdir(data_home):
-        logger.error("Invalid {:s}: {:s}".format(envvar, data_home))
+        logger.error("Invalid %s: %s", envvar, data_home)
         return 1, 1
 
     deployments_root = os.path.join(data_home, "deployments")
     if not os.path.isdir(deployments_root):
-        logger.warning("Invalid deployments root: {:s}".format(deployments_root))
+        logger.warning("Invalid deployments root: %s", deployments_root)
         return 1, 1
 
     return data_home, deployments_root
 
 
+def check_deployment_datapaths(
+    logger, deployments, deployments_root, mode, output
+) -> list[tuple[str, str, str, str]]:
+    """
+    Find the data paths of glider deployments to convert, skipping (and logging an error for) each
+    deployment that is missing its binary data, output or proc-logs directory.
+
+    Parameters
+    ----------
+        logger (Logger): logger object
+        deployments (list): glider deployment/trajectory names e.g. ru44-20250306T0038
+        deployments_root (str): root directory for glider deployments
+        mode (str): dataset mode, rt or delayed
+        output (str): output directory the conversion writes to, "rawnc" (raw netcdf) or "out" (qc queue)
+    Returns
+    ----------
+        jobs (list): (deployment, deployment_location, data_path, output_path) of each deployment
+    """
+    jobs = []
+    for deployment in deployments:
+        data_path, nc_outpath, outdir, deployment_location = (
+            find_glider_deployment_datapath(logger, deployment, deployments_root, mode)
+        )
+
+        # find_glider_deployment_datapath already checked that the binary data path is a directory
+        if data_path is None:
+            logger.error(
+                "%s binary file data directory not found", deployment, stacklevel=2
+            )
+            continue
+
+        output_path = nc_outpath if output == "rawnc" else outdir
+        if not os.path.isdir(output_path):
+            logger.error(_MISSING_OUTPUT_DIR[output], deployment, stacklevel=2)
+            continue
+
+        if not is_dir_entry(scan_dir(deployment_location), "proc-logs"):
+            logger.error(
+                "%s deployment proc-logs directory not found", deployment, stacklevel=2
+            )
+            continue
+
+        jobs.append((deployment, deployment_location, data_path, output_path))
+
+    return jobs
+
+
+def _convert_deployment_job(
+    convert, procname, mode, loglevel, deployment, deployment_location, *paths, **kwargs
+) -> tuple[str, int]:
+    """Runs convert for one deployment in a worker process, logging to the deployment proc-log."""
+    logfilename = logfile_deploymentname(deployment, mode, procname)
+    logFile = os.path.join(deployment_location, "proc-logs", logfilename)
+    # the logger is named after the deployment, so a worker that is reused for another
+    # deployment logs to that deployment's proc-log rather than the first one
+    logger = setup_logger(f"{convert.__module__}.{deployment}", loglevel, logFile)
+    try:
+        return deployment, convert(
+            logger, deployment, deployment_location, *paths, mode=mode, **kwargs
+        )
+    finally:
+        # worker processes exit without running atexit, so write out the buffered log records
+        # and close the proc-log here
+        close_logger(logger)
+
+
+def convert_deployments(convert, jobs, procname, mode, loglevel, cores, **kwargs):
+    """
+    Convert deployments in parallel, one deployment per worker process.
+
+    Parameters
+    ----------
+        convert (function): module-level function called as convert(logger, deployment,
+            deployment_location, data_path, output_path, mode=mode, **kwargs) in a worker,
+            logging to the deployment proc-log and returning the number of files written
+        jobs (list): deployments from check_deployment_datapaths
+        procname (str): name of the proc-log, e.g. proc_bin2raw
+        mode (str): dataset mode, rt or delayed
+        loglevel (str): logging level of the proc-logs
+        cores (int): maximum number of worker processes
+        kwargs: other arguments passed to convert
+    Returns
+    ----------
+        results (generator): (deployment, count) of each deployment, in the order of jobs
+    """
+    if not jobs:
+        return
+
+    convert_job = partial(
+        _convert_deployment_job, convert, procname, mode, loglevel, **kwargs
+    )
+    # each worker holds a whole deployment conversion in memory, so the pool is capped at
+    # the requested number of cores
+    with ProcessPoolExecutor(max_workers=max(1, min(len(jobs), cores))) as executor:
+        yield from executor.map(convert_job, *zip(*jobs))
+
+
 def return_season(ts):
     """Returns the season for a given datetime object."""
     # originally written by lgarzio: https://github.com/lgarzio/ruglider_processing/blob/master/ruglider_processing/common.py
-    if ts.month in [12, 1, 2]:
-        season = "DJF"
-    elif ts.month in [3, 4, 5]:
-        season = "MAM"
-    elif ts.month in [6, 7, 8]:
-        season = "JJA"
-    elif ts.month in [9, 10, 11]:
-        season = "SON"
+    return _SEASONS[ts.month - 1]
+
 
-    return season
+def return_seasons(ts_array):
+    """Returns an array with the season of each timestamp in a pandas DatetimeIndex (or Series.dt)."""
+    import numpy as np
+
+    return np.asarray(_SEASONS)[np.asarray(ts_array.month) - 1]
+
+
+def scan_dir(dirpath) -> dict[str, os.DirEntry] | None:
+    """
+    List a directory once so that its contents can be checked without a stat call per path.
+
+    Parameters
+    ----------
+        dirpath (str): directory to list
+    Returns
+    ----------
+        entries (dict): directory entries keyed by name, or None if dirpath is not a directory
+    """
+    try:
+        with os.scandir(dirpath) as it:
+            return {e.name: e for e in it}
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def list_files(dirpath, suffix="") -> list[str]:
+    """
+    List the files in a directory that end with suffix, skipping hidden files like glob does.
+
+    Parameters
+    ----------
+        dirpath (str): directory to list
+        suffix (str): optional file suffix, e.g. ".dbd"
+    Returns
+    ----------
+        files (list): paths of the matching files, empty if dirpath is not a directory
+    """
+    entries = scan_dir(dirpath)
+    if entries is None:
+        return []
+    return [
+        e.path
+        for name, e in entries.items()
+        if name.endswith(suffix) and not name.startswith(".") and e.is_file()
+    ]
+
+
+def is_file_entry(entries, name) -> bool:
+    """Returns True if name is a file in the directory entries from scan_dir (which may be None)."""
+    return entries is not None and name in entries and entries[name].is_file()
+
+
+def is_dir_entry(entries, name) -> bool:
+    """Returns True if name is a directory in the directory entries from scan_dir (which may be None)."""
+    return entries is not None and name in entries and entries[name].is_dir()
+
+
+def find_deployment_config_files(logger, deployment_location) -> tuple[str, str]:
+    """
+    Find the deployment.yml and sensors.txt files in the deployment config directory, listing
+    the directory once. A warning is logged for each one that is missing, attributed to the
+    caller so it reads the same in the proc-log as when the checks were inline.
+
+    Parameters
+    ----------
+        logger (logging.Logger): logger for the warnings
+        deployment_location (str): deployment directory
+    Returns
+    ----------
+        deploymentyaml (str): path of deployment.yml
+        sensorlist (str): path of sensors.txt
+    """
+    deployment_config_root = os.path.join(deployment_location, "config", "proc")
+    config_entries = scan_dir(deployment_config_root)
+    if config_entries is None:
+        logger.warning(
+            "Invalid deployment config root: %s", deployment_config_root, stacklevel=2
+        )
+
+    # Find metadata files
+    deploymentyaml = os.path.join(deployment_config_root, "deployment.yml")
+    if not is_file_entry(config_entries, "deployment.yml"):
+        logger.warning("Invalid deployment.yaml file: %s", deploymentyaml, stacklevel=2)
+
+    # Find sensor list for processing binary files
+    sensorlist = os.path.join(deployment_config_root, "sensors.txt")
+    if not is_file_entry(config_entries, "sensors.txt"):
+        logger.warning("Invalid sensors.txt file: %s", sensorlist, stacklevel=2)
+
+    return deploymentyaml, sensorlist
+
+
+def _kernel_copy(infd, outfd, size) -> bool:
+    """
+    Copies size bytes between file descriptors inside the kernel, returns False if no method copies
+    them all. A method that stops short (returns 0 with bytes left) counts as failed, so the next
+    one is tried, and the output is rewound and truncated before each attempt and after the last.
+    """
+    for copy in _KERNEL_COPIES:
+        # start over if a previous method failed part way through
+        os.lseek(infd, 0, os.SEEK_SET)
+        os.lseek(outfd, 0, os.SEEK_SET)
+        os.ftruncate(outfd, 0)
+        try:
+            remaining = size
+            while remaining > 0:
+                copied = copy(infd, outfd, remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except OSError:
+            continue
+        if remaining == 0:
+            return True
+
+    # leave the files as the userspace fallback expects them
+    os.lseek(infd, 0, os.SEEK_SET)
+    os.lseek(outfd, 0, os.SEEK_SET)
+    os.ftruncate(outfd, 0)
+    return False
+
+
+def fast_copy(src, dst):
+    """
+    Copy a file (and its permission bits) like shutil.copy, keeping the data inside the kernel
+    where possible: os.copy_file_range is tried first, then os.sendfile (e.g. across filesystems
+    on older kernels). If neither works (e.g. on some FUSE mounts) or the copy comes up short,
+    files over 1 MiB are written from a read-only memory map and smaller ones are copied with a
+    1 MiB buffer.
+
+    Parameters
+    ----------
+        src (str): file to copy
+        dst (str): destination file or directory
+    Returns
+    ----------
+        dst (str): path of the copied file
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    # opening dst for writing would truncate src if they are the same file
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        # a size of 0 can't be trusted (procfs-like files report 0 but have contents), and a
+        # kernel copy that wrote fewer bytes than the source holds is redone in userspace
+        if (
+            size == 0
+            or not _kernel_copy(fsrc.fileno(), fdst.fileno(), size)
+            or os.fstat(fdst.fileno()).st_size != size
+        ):
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            if size > _MMAP_COPY_THRESHOLD:
+                with mmap.mmap(fsrc.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    fdst.write(mapped)
+            else:
+                shutil.copyfileobj(fsrc, fdst, _COPY_BUFSIZE)
+
+    shutil.copymode(src, dst)
+    return dst
+
+
+def count_files_by_suffix(dirpath, suffixes) -> dict[str, int]:
+    """
+    Count the files in a directory by suffix, listing the directory only once.
+
+    Parameters
+    ----------
+        dirpath (str): directory to list
+        suffixes (iterable): file suffixes to count, e.g. (".tbd", ".sbd")
+    Returns
+    ----------
+        counts (dict): number of files ending with each suffix, keyed by suffix
+    """
+    counts = dict.fromkeys(suffixes, 0)
+    with os.scandir(dirpath) as it:
+        for e in it:
+            for suffix in counts:
+                if e.name.endswith(suffix) and e.is_file():
+                    counts[suffix] += 1
+                    break
+    return counts
+
+
+def file_mtimes(dirpath, suffix) -> dict[str, int]:
+    """
+    Snapshot a directory so that the files a conversion writes or rewrites can be counted afterwards.
+
+    Parameters
+    ----------
+        dirpath (str): directory to list
+        suffix (str): file suffix, e.g. ".nc"
+    Returns
+    ----------
+        mtimes (dict): modification time in nanoseconds of each file ending with suffix, keyed by name
+    """
+    with os.scandir(dirpath) as entries:
+        return {
+            e.name: e.stat().st_mtime_ns
+            for e in entries
+            if e.name.endswith(suffix) and e.is_file()
+        }
+
+
+@lru_cache(maxsize=None)
+def _default_fillvalue(dtype):
+    """Returns the netCDF4.default_fillvals fill value for a numpy dtype."""
+    from netCDF4 import default_fillvals
+
+    return default_fillvals[f"{dtype.kind}{dtype.itemsize}"]
 
 
 def set_encoding(data_array, original_encoding=None):
@@ -283,14 +626,9 @@ def set_encoding(data_array, original_encoding=None):
     if original_encoding:
         data_array.encoding = original_encoding
 
-    try:
-        encoding_dtype = data_array.encoding["dtype"]
-    except KeyError:
-        data_array.encoding["dtype"] = data_array.dtype
+    encoding = data_array.encoding
+    encoding.setdefault("dtype", data_array.dtype)
 
-    try:
-        encoding_fillvalue = data_array.encoding["_FillValue"]
-    except KeyError:
+    if "_FillValue" not in encoding:
         # set the fill value using netCDF4.default_fillvals
-        data_type = f"{data_array.dtype.kind}{data_array.dtype.itemsize}"
-        data_array.encoding["_FillValue"] = default_fillvals[data_type]
+        encoding["_FillValue"] = _default_fillvalue(data_array.dtype)
@@ -1,23 +1,33 @@
 #!/usr/bin/env python
 
+import atexit
 import os
 import pwd
 from datetime import datetime
 import logging
+import logging.handlers
+from functools import lru_cache
+
+# looked up once, since getpwuid can be a network lookup on LDAP/SSSD systems
+_USER: str = pwd.getpwuid(os.getuid()).pw_name
+
+
+@lru_cache(maxsize=1)
+def _today() -> str:
+    """Returns the date of the first call as YYYYmmdd, so every log of a run shares it."""
+    return datetime.now().strftime("%Y%m%d")
 
 
 def logfile_basename() -> str:
     """Returns the base qc log file name."""
     # originally written by lgarzio: https://github.com/lgarzio/ruglider_processing/blob/master/ruglider_processing/loggers.py
-    user: str = pwd.getpwuid(os.getuid())[0]
-    return f"/home/SOMAS_Glider/logs/{user}-glider_qc.log"
+    return f"/home/SOMAS_Glider/logs/{_USER}-glider_qc.log"
 
 
 def logfile_deploymentname(deployment: str, mode: str, fname: str) -> str:
     """Returns the deployment proc-log file name."""
     # originally written by lgarzio: https://github.com/lgarzio/ruglider_processing/blob/master/ruglider_processing/loggers.py
-    user: str = pwd.getpwuid(os.getuid())[0]
-    return f"{user}-{datetime.now().strftime('%Y%m%d')}-{deployment}-{mode}-{fname}.log"
+    return f"{_USER}-{_today()}-{deployment}-{mode}-{fname}.log"
 
 
 def setup_logger(name: str, loglevel: str, logfile: str):
@@ -33,8 +43,33 @@ def setup_logger(name: str, loglevel: str, logfile: str):
         handler = logging.FileHandler(logfile)
         handler.setFormatter(log_format)
 
+        # buffer records so they are written to the log file in batches, but write errors right away
+        buffer = logging.handlers.MemoryHandler(
+            1024, flushLevel=logging.ERROR, target=handler
+        )
+        atexit.register(buffer.flush)
+
         log_level = getattr(logging, loglevel)
         logger.setLevel(log_level)
-        logger.addHandler(handler)
+        logger.addHandler(buffer)
 
     return logger
+
+
+def flush_logger(logger: logging.Logger):
+    """Writes out the records buffered by the handlers of a logger set up by setup_logger."""
+    for handler in logger.handlers:
+        handler.flush()
+
+
+def close_logger(logger: logging.Logger):
+    """Flushes, closes and removes the handlers of a logger set up by setup_logger."""
+    flush_logger(logger)
+    for handler in logger.handlers[:]:
+        if isinstance(handler, logging.handlers.MemoryHandler):
+            # closing a MemoryHandler leaves its target open, so close the log file too
+            atexit.unregister(handler.flush)
+            if handler.target is not None:
+                handler.target.close()
+        handler.close()
+        logger.removeHandler(handler)
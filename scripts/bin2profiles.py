@@ -2,11 +2,109 @@
 
 import argparse
 import os
+import tempfile
 
-import pyglider.ncprocess as ncprocess
-import pyglider.slocum as slocum
 import sbuglider.common as cf
-from sbuglider.loggers import logfile_basename, logfile_deploymentname, setup_logger
+from sbuglider.loggers import logfile_basename, setup_logger
+
+# science suffix, flight suffix and binary file search pattern for each dataset mode
+_MODE_SUFFIXES = {
+    "rt": ("tbd", "sbd", "*.[s|t]bd"),
+    "delayed": ("ebd", "dbd", "*.[d|e]bd"),
+}
+
+
+def _convert_deployment(
+    logging,
+    deployment,
+    deployment_location,
+    binarydir,
+    outdir,
+    cacdir,
+    mode,
+    profile_filter_time,
+    min_time,
+    min_samples,
+    gap_threshold,
+) -> int:
+    """
+    Convert the binary files of a single deployment into netcdf profiles, in a worker process
+    run by cf.convert_deployments that logs to the deployment proc-log.
+
+    Returns
+    ----------
+        ocount (int): number of netcdf profiles written
+    """
+    # pyglider pulls in the whole numeric stack, so only import it once there is work to do
+    import pyglider.ncprocess as ncprocess
+    import pyglider.slocum as slocum
+
+    # find the metadata files and sensor list in the deployment configuration path
+    deploymentyaml, sensorlist = cf.find_deployment_config_files(
+        logging, deployment_location
+    )
+
+    scisuffix, glidersuffix, search = _MODE_SUFFIXES[mode]
+
+    logging.info("Processing: %s-%s", deployment, mode)
+
+    # convert binary *.T/EBD and *.S/DBD into *.t/ebd.nc and *.s/dbd.nc netcdf files.
+    logging.info(
+        "Converting binary *.%s and *.%s into *.%s.nc and *.%s.nc netcdf files",
+        scisuffix,
+        glidersuffix,
+        scisuffix,
+        glidersuffix,
+    )
+    logging.info("Binary filepath: %s", binarydir)
+    logging.info("Cache filepath: %s", cacdir)
+    logging.info("Output filepath: %s", outdir)
+
+    # log the number of binary files to be converted
+    counts = cf.count_files_by_suffix(binarydir, (f".{scisuffix}", f".{glidersuffix}"))
+    scicount = counts[f".{scisuffix}"]
+    flightcount = counts[f".{glidersuffix}"]
+
+    # snapshot the existing profiles so that only the ones written by this run are counted
+    existing = cf.file_mtimes(outdir, ".nc")
+
+    # convert binary files and save to a temporary netcdf timeseries file on local scratch
+    # ($TMPDIR), so it is not written to and read back from the output filesystem. The
+    # temporary directory is removed even if the profile extraction fails.
+    with tempfile.TemporaryDirectory(prefix="sbuglider_") as tmpdir:
+        outname, ds = slocum.binary_to_timeseries_new(
+            binarydir,
+            cacdir,
+            tmpdir,
+            deploymentyaml,
+            search=search,
+            profile_filt_time=profile_filter_time,
+            profile_min_time=min_time,
+            min_samples=min_samples,
+            gap_threshold=gap_threshold,
+            _log=logging,
+        )
+
+        # extract profiles from the temporary netcdf timeseries file
+        ncprocess.extract_timeseries_profiles(
+            outname, outdir, deploymentyaml, _log=logging
+        )
+
+    # log how many files were successfully converted from binary to *.nc
+    ocount = sum(
+        1
+        for name, mtime in cf.file_mtimes(outdir, ".nc").items()
+        if existing.get(name) != mtime
+    )
+    logging.info(
+        "Successfully merged %s science binary files and %s engineering binary files into %s netcdf profiles",
+        scicount,
+        flightcount,
+        ocount,
+    )
+    logging.info("Finished converting binary files to raw netcdf files")
+
+    return ocount
 
 
 def main(args):
@@ -23,6 +121,7 @@ def main(args):
     loglevel: str = args.loglevel.upper()
     mode: str = args.mode.lower()
     test: bool = args.test
+    cores: int = args.cores
 
     # set up the logger
     logfile_base = logfile_basename()
@@ -32,116 +131,27 @@ def main(args):
     data_home, deployments_root = cf.find_glider_deployments_rootdir(logging_base, test)
     cacdir = os.path.join(data_home, "cac")
     if not os.path.isdir(cacdir):
-        logging_base.error(f"cache file directory not found: {cacdir}")
+        logging_base.error("cache file directory not found: %s", cacdir)
 
     if isinstance(deployments_root, str):
 
-        for deployment in deployments:
-
-            # find the deployment binary data filepath
-            binarydir, rawncdir, outdir, deployment_location = (
-                cf.find_glider_deployment_datapath(
-                    logging_base, deployment, deployments_root, mode
-                )
-            )
-
-            # check if binarydir, rawncdir, deployment_location exist
-            if not os.path.isdir(binarydir):
-                logging_base.error(f"{deployment} binary file data directory not found")
-                continue
-
-            if not os.path.isdir(outdir):
-                logging_base.error(f"{deployment} output file data directory not found")
-                continue
-
-            if not os.path.isdir(os.path.join(deployment_location, "proc-logs")):
-                logging_base.error(
-                    f"{deployment} deployment proc-logs directory not found"
-                )
-                continue
-
-            # set up logger
-            logfilename = logfile_deploymentname(deployment, mode, "proc_bin2profiles")
-            logFile = os.path.join(deployment_location, "proc-logs", logfilename)
-            logging = setup_logger(__name__, loglevel, logFile)
-
-            # Set the deployment configuration path
-            deployment_config_root = os.path.join(deployment_location, "config", "proc")
-            if not os.path.isdir(deployment_config_root):
-                logging.warning(
-                    f"Invalid deployment config root: {deployment_config_root}"
-                )
-
-            # Find metadata files
-            deploymentyaml = os.path.join(deployment_config_root, "deployment.yml")
-            if not os.path.isfile(deploymentyaml):
-                logging.warning(f"Invalid deployment.yaml file: {deploymentyaml}")
-
-            # Find sensor list for processing binary files
-            sensorlist = os.path.join(deployment_config_root, "sensors.txt")
-            if not os.path.isfile(sensorlist):
-                logging.warning(f"Invalid sensors.txt file: {sensorlist}")
-
-            if mode == "rt":
-                scisuffix = "tbd"
-                glidersuffix = "sbd"
-                search = "*.[s|t]bd"
-                # profile_filter_time = 40
-            elif mode == "delayed":
-                scisuffix = "ebd"
-                glidersuffix = "dbd"
-                search = "*.[d|e]bd"
-                # profile_filter_time = 40
-            else:
-                logging.warning(f"Invalid mode provided: {mode}")
-                continue
-
-            logging.info(f"Processing: {deployment}-{mode}")
-
-            # convert binary *.T/EBD and *.S/DBD into *.t/ebd.nc and *.s/dbd.nc netcdf files.
-            logging.info(
-                f"Converting binary *.{scisuffix} and *.{glidersuffix} into *.{scisuffix}.nc and *.{glidersuffix}.nc netcdf files"
-            )
-            logging.info(f"Binary filepath: {binarydir}")
-            logging.info(f"Cache filepath: {cacdir}")
-            logging.info(f"Output filepath: {outdir}")
-
-            # log the number of binary files to be converted
-            scicount = len(
-                [f for f in os.listdir(binarydir) if f.endswith(f".{scisuffix}")]
-            )
-            flightcount = len(
-                [f for f in os.listdir(binarydir) if f.endswith(f".{glidersuffix}")]
-            )
-
-            # convert binary files and save to a temporary netcdf timeseries file
-            outname, ds = slocum.binary_to_timeseries_new(
-                binarydir,
-                cacdir,
-                outdir,
-                deploymentyaml,
-                search=search,
-                profile_filt_time=profile_filter_time,
-                profile_min_time=min_time,
-                min_samples=min_samples,
-                gap_threshold=gap_threshold,
-                _log=logging,
-            )
-
-            # extract profiles from the temporary netcdf timeseries file
-            ncprocess.extract_timeseries_profiles(
-                outname, outdir, deploymentyaml, _log=logging
-            )
-
-            # delete the temporary netcdf timeseries file
-            os.remove(outname)
-
-            # log how many files were successfully converted from binary to *.nc
-            ocount = len([f for f in os.listdir(outdir) if f.endswith(".nc")])
-            logging.info(
-                f"Successfully merged {scicount} science binary files and {flightcount} engineering binary files into {ocount} netcdf profiles"
-            )
-            logging.info(f"Finished converting binary files to raw netcdf files")
+        jobs = cf.check_deployment_datapaths(
+            logging_base, deployments, deployments_root, mode, "out"
+        )
+        for deployment, ocount in cf.convert_deployments(
+            _convert_deployment,
+            jobs,
+            "proc_bin2profiles",
+            mode,
+            loglevel,
+            cores,
+            cacdir=cacdir,
+            profile_filter_time=profile_filter_time,
+            min_time=min_time,
+            min_samples=min_samples,
+            gap_threshold=gap_threshold,
+        ):
+            logging_base.info("%s: %s netcdf profiles", deployment, ocount)
 
 
 if __name__ == "__main__":
@@ -209,6 +219,14 @@ if __name__ == "__main__":
         default="info",
     )
 
+    arg_parser.add_argument(
+        "-n",
+        "--cores",
+        help="Number of deployments to convert in parallel",
+        type=int,
+        default=max(1, int((os.cpu_count() or 1) * 0.8)),
+    )
+
     arg_parser.add_argument(
         "-test",
         "--test",
@@ -8,7 +8,80 @@ import pyglider.ncprocess as ncprocess
 import pyglider.slocum as slocum
 import pyglider.utils as pgutils
 import sbuglider.common as cf
-from sbuglider.loggers import logfile_basename, logfile_deploymentname, setup_logger
+from sbuglider.loggers import logfile_basename, setup_logger
+
+# science and flight binary file suffixes for each dataset mode
+_MODE_SUFFIXES = {"rt": ("tbd", "sbd"), "delayed": ("ebd", "dbd")}
+
+
+def _convert_deployment(
+    logging, deployment, deployment_location, binarydir, rawncdir, cacdir, mode
+) -> int:
+    """
+    Convert the binary files of a single deployment into raw netcdf files, in a worker process
+    run by cf.convert_deployments that logs to the deployment proc-log.
+
+    Returns
+    ----------
+        ocount (int): number of raw netcdf files written
+    """
+    # find the metadata files and sensor list in the deployment configuration path
+    deploymentyaml, sensorlist = cf.find_deployment_config_files(
+        logging, deployment_location
+    )
+
+    scisuffix, glidersuffix = _MODE_SUFFIXES[mode]
+
+    logging.info("Processing: %s-%s", deployment, mode)
+
+    # convert binary *.T/EBD and *.S/DBD into *.t/ebd.nc and *.s/dbd.nc netcdf files.
+    logging.info(
+        "Converting binary *.%s and *.%s into *.%s.nc and *.%s.nc netcdf files",
+        scisuffix,
+        glidersuffix,
+        scisuffix,
+        glidersuffix,
+    )
+    logging.info("Binary filepath: %s", binarydir)
+    logging.info("Cache filepath: %s", cacdir)
+    logging.info("Output filepath: %s", rawncdir)
+
+    # log the number of binary files to be converted
+    counts = cf.count_files_by_suffix(binarydir, (f".{scisuffix}", f".{glidersuffix}"))
+    scicount = counts[f".{scisuffix}"]
+    flightcount = counts[f".{glidersuffix}"]
+
+    # snapshot the existing raw netcdf files so that only the ones written by this run are counted
+    # (binary_to_rawnc is incremental, so files from earlier runs are usually left as they are)
+    existing = cf.file_mtimes(rawncdir, ".nc")
+
+    slocum.binary_to_rawnc(
+        binarydir,
+        rawncdir,
+        cacdir,
+        sensorlist,
+        deploymentyaml,
+        incremental=True,
+        scisuffix=scisuffix,
+        glidersuffix=glidersuffix,
+        _log=logging,
+    )
+
+    # log how many files were successfully converted from binary to *.nc
+    ocount = sum(
+        1
+        for name, mtime in cf.file_mtimes(rawncdir, ".nc").items()
+        if existing.get(name) != mtime
+    )
+    logging.info(
+        "Successfully merged %s science binary files and %s engineering binary files into %s raw netcdf files",
+        scicount,
+        flightcount,
+        ocount,
+    )
+    logging.info("Finished converting binary files to raw netcdf files")
+
+    return ocount
 
 
 def main(args):
@@ -21,6 +94,7 @@ def main(args):
     loglevel: str = args.loglevel.upper()
     mode: str = args.mode.lower()
     test: bool = args.test
+    cores: int = args.cores
 
     # set up the logger
     logfile_base = logfile_basename()
@@ -30,106 +104,23 @@ def main(args):
     data_home, deployments_root = cf.find_glider_deployments_rootdir(logging_base, test)
     cacdir = os.path.join(data_home, "cac")
     if not os.path.isdir(cacdir):
-        logging_base.error(f"cache file directory not found: {cacdir}")
+        logging_base.error("cache file directory not found: %s", cacdir)
 
     if isinstance(deployments_root, str):
 
-        for deployment in deployments:
-
-            # find the deployment binary data filepath
-            binarydir, rawncdir, outdir, deployment_location = (
-                cf.find_glider_deployment_datapath(
-                    logging_base, deployment, deployments_root, mode
-                )
-            )
-
-            # check if binarydir, rawncdir, deployment_location exist
-            if not os.path.isdir(binarydir):
-                logging_base.error(f"{deployment} binary file data directory not found")
-                continue
-
-            if not os.path.isdir(rawncdir):
-                logging_base.error(
-                    f"{deployment} raw NetCDF output file data directory not found"
-                )
-                continue
-
-            if not os.path.isdir(os.path.join(deployment_location, "proc-logs")):
-                logging_base.error(
-                    f"{deployment} deployment proc-logs directory not found"
-                )
-                continue
-
-            # set up logger
-            logfilename = logfile_deploymentname(deployment, mode, "proc_bin2raw")
-            logFile = os.path.join(deployment_location, "proc-logs", logfilename)
-            logging = setup_logger(__name__, loglevel, logFile)
-
-            # Set the deployment configuration path
-            deployment_config_root = os.path.join(deployment_location, "config", "proc")
-            if not os.path.isdir(deployment_config_root):
-                logging.warning(
-                    f"Invalid deployment config root: {deployment_config_root}"
-                )
-
-            # Find metadata files
-            deploymentyaml = os.path.join(deployment_config_root, "deployment.yml")
-            if not os.path.isfile(deploymentyaml):
-                logging.warning(f"Invalid deployment.yaml file: {deploymentyaml}")
-
-            # Find sensor list for processing binary files
-            sensorlist = os.path.join(deployment_config_root, "sensors.txt")
-            if not os.path.isfile(sensorlist):
-                logging.warning(f"Invalid sensors.txt file: {sensorlist}")
-
-            if mode == "rt":
-                scisuffix = "tbd"
-                glidersuffix = "sbd"
-                # search = "*.[s|t]bd"
-            elif mode == "delayed":
-                scisuffix = "ebd"
-                glidersuffix = "dbd"
-                # search = "*.[d|e]bd"
-            else:
-                logging.warning(f"Invalid mode provided: {mode}")
-                continue
-
-            logging.info(f"Processing: {deployment}-{mode}")
-
-            # convert binary *.T/EBD and *.S/DBD into *.t/ebd.nc and *.s/dbd.nc netcdf files.
-            logging.info(
-                f"Converting binary *.{scisuffix} and *.{glidersuffix} into *.{scisuffix}.nc and *.{glidersuffix}.nc netcdf files"
-            )
-            logging.info(f"Binary filepath: {binarydir}")
-            logging.info(f"Cache filepath: {cacdir}")
-            logging.info(f"Output filepath: {rawncdir}")
-
-            # log the number of binary files to be converted
-            scicount = len(
-                [f for f in os.listdir(binarydir) if f.endswith(f".{scisuffix}")]
-            )
-            flightcount = len(
-                [f for f in os.listdir(binarydir) if f.endswith(f".{glidersuffix}")]
-            )
-
-            slocum.binary_to_rawnc(
-                binarydir,
-                rawncdir,
-                cacdir,
-                sensorlist,
-                deploymentyaml,
-                incremental=True,
-                scisuffix=scisuffix,
-                glidersuffix=glidersuffix,
-                _log=logging,
-            )
-
-            # log how many files were successfully converted from binary to *.nc
-            ocount = len([f for f in os.listdir(rawncdir) if f.endswith(".nc")])
-            logging.info(
-                f"Successfully merged {scicount} science binary files and {flightcount} engineering binary files into {ocount} raw netcdf files"
-            )
-            logging.info(f"Finished converting binary files to raw netcdf files")
+        jobs = cf.check_deployment_datapaths(
+            logging_base, deployments, deployments_root, mode, "rawnc"
+        )
+        for deployment, ocount in cf.convert_deployments(
+            _convert_deployment,
+            jobs,
+            "proc_bin2raw",
+            mode,
+            loglevel,
+            cores,
+            cacdir=cacdir,
+        ):
+            logging_base.info("%s: %s raw netcdf files", deployment, ocount)
 
 
 if __name__ == "__main__":
@@ -165,6 +156,14 @@ if __name__ == "__main__":
         default="info",
     )
 
+    arg_parser.add_argument(
+        "-n",
+        "--cores",
+        help="Number of deployments to convert in parallel",
+        type=int,
+        default=max(1, int((os.cpu_count() or 1) * 0.8)),
+    )
+
     arg_parser.add_argument(
         "-test",
         "--test",
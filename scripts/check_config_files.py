@@ -1,12 +1,13 @@
 #!/usr/bin/env python
 
 import argparse
-import glob
 import os
-import shutil
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 
+import sbuglider.common as cf
 from sbuglider.loggers import logfile_basename, setup_logger
 
 
@@ -36,42 +37,52 @@ def main(args):
         logging_base.error("Invalid GLIDER_CONFIG_HOME: " + config_home)
         sys.exit(1)
 
+    # parse each deployment name (glider-YYYYmmddTHHMM) once into its glider name and
+    # deployment config directory
+    parsed = []
     for deployment in deployments:
-        glider_name = deployment.split("-")[0]
-        year = deployment.split("-")[1][:4]
-
-        # check if config root directory and files exist
-        indir = os.path.join(config_home, glider_name)
-        if not os.path.isdir(indir):
-            logging_base.error(f"Template config directory {indir} not found")
-            sys.exit(1)
-
-        # check if deployment config directory exists
+        glider_name, trajectory = deployment.split("-", 1)
+        year = trajectory[:4]
         outdir = os.path.join(
             data_home, "deployments", year, deployment, "config", "proc"
         )
-        if not os.path.isdir(outdir):
-            logging_base.error(f"Deployment config directory {outdir} not found")
-            sys.exit(1)
+        parsed.append((deployment, glider_name, outdir))
 
-        filenames = os.path.join(indir, "*")
-        files = glob.glob(filenames)
+    # template config files, keyed by template directory
+    template_files = {}
 
-        try:
-            [shutil.copy(f, outdir) for f in files]
-        except Exception as e:
-            logging_base.error(f"Error copying config files: {e}")
-            sys.exit(1)
+    # the config files are small, so copy them in threads shared by all deployments
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        for deployment, glider_name, outdir in parsed:
+
+            # check if config root directory and files exist
+            indir = os.path.join(config_home, glider_name)
+            if not os.path.isdir(indir):
+                logging_base.error(f"Template config directory {indir} not found")
+                sys.exit(1)
+
+            # check if deployment config directory exists
+            if not os.path.isdir(outdir):
+                logging_base.error(f"Deployment config directory {outdir} not found")
+                sys.exit(1)
+
+            # deployments of the same glider share a template directory, so only list it once
+            if indir not in template_files:
+                template_files[indir] = cf.list_files(indir)
+            files = template_files[indir]
+
+            try:
+                list(executor.map(cf.fast_copy, files, repeat(outdir)))
+            except Exception as e:
+                logging_base.error(f"Error copying config files: {e}")
+                sys.exit(1)
 
     # Confirmation step to make user sure that all config files are correct.
-    for deployment in deployments:
-        glider_name = deployment.split("-")[0]
-        year = deployment.split("-")[1][:4]
-        outdir = os.path.join(
-            data_home, "deployments", year, deployment, "config", "proc"
-        )
+    # open every config directory up front so the user isn't waiting on a window between prompts
+    for deployment, glider_name, outdir in parsed:
         subprocess.Popen(["xdg-open", outdir])  # linux specific!
 
+    for deployment in deployments:
         response = input(
             f"Are the config files for {deployment} correct? (y/n): "
         ).lower()
@@ -1,10 +1,10 @@
 #!/user/bin/env python
 
 import argparse
-import glob
-import shutil
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 
 import sbuglider.common as cf
 from sbuglider.loggers import logfile_basename, setup_logger
@@ -13,17 +13,25 @@ from sbuglider.loggers import logfile_basename, setup_logger
 def _check_files(
     flight_dir, flight_suffix, science_dir, sci_suffix, logging
 ) -> tuple[list, list]:
-    flight_files = glob.glob(os.path.join(flight_dir, "*" + flight_suffix))
-    science_files = glob.glob(os.path.join(science_dir, "*" + sci_suffix))
+    # the flight and science logs are in different directories, so list them at the same time
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        flight_future = executor.submit(cf.list_files, flight_dir, flight_suffix)
+        science_future = executor.submit(cf.list_files, science_dir, sci_suffix)
+        flight_files = flight_future.result()
+        science_files = science_future.result()
 
     if len(flight_files) == 0 or len(science_files) == 0:
         logging.error(
-            f"No {flight_suffix} or {sci_suffix} files found in {flight_dir} and {science_dir}"
+            "No %s or %s files found in %s and %s",
+            flight_suffix,
+            sci_suffix,
+            flight_dir,
+            science_dir,
         )
         return None
     else:
-        logging.info(f"Found {len(flight_files)} flight files in {flight_dir}")
-        logging.info(f"Found {len(science_files)} science files in {science_dir}")
+        logging.info("Found %s flight files in %s", len(flight_files), flight_dir)
+        logging.info("Found %s science files in %s", len(science_files), science_dir)
         return flight_files, science_files
 
 
@@ -32,12 +40,14 @@ def main(args):
     deployments = args.deployments
     loglevel = args.loglevel.upper()
     compression = args.compression
+    workers = args.workers
 
     # set up the logger
     logfile_base = logfile_basename()
     logging_base = setup_logger("logging_base", loglevel, logfile_base)
 
     data_home = os.getenv("GLIDER_DATA_HOME")
+    deployment_root = os.path.join(data_home, "deployments")
 
     for deployment in deployments:
         flight_dir = os.path.join(data_home, "raw", deployment, "flight", "logs")
@@ -45,21 +55,20 @@ def main(args):
 
         # check if raw directories exist
         if not os.path.isdir(flight_dir):
-            logging_base.error(f"Flight directory {flight_dir} not found")
+            logging_base.error("Flight directory %s not found", flight_dir)
         if not os.path.isdir(science_dir):
-            logging_base.error(f"Science directory {science_dir} not found")
+            logging_base.error("Science directory %s not found", science_dir)
 
-        # get binary directory
-        deployment_root = os.path.join(data_home, "deployments")
+        # get binary directory (find_glider_deployment_location checks that the deployment
+        # directory exists and returns None if it doesn't)
         deployment_dir = cf.find_glider_deployment_location(
             logging_base, deployment, deployment_root
         )
+        if deployment_dir is None:
+            logging_base.error("Deployment directory for %s not found", deployment)
+            continue
         binary_dir = os.path.join(deployment_dir, "data", "in", "binary", "debd")
 
-        # check if deployment directory exists
-        if not os.path.isdir(deployment_dir):
-            logging_base.error(f"Binary directory {deployment_dir} not found")
-
         # check if files exist
         if compression:
             flight_suffix = ".dcd"
@@ -73,7 +82,10 @@ def main(args):
             cf.decompress_dbds(logging_base, science_dir, sci_suffix, binary_dir)
 
             logging_base.info(
-                f"Decompressed and wrote {len(flight_files)} flight and {len(science_files)} science files to {binary_dir}"
+                "Decompressed and wrote %s flight and %s science files to %s",
+                len(flight_files),
+                len(science_files),
+                binary_dir,
             )
         else:
             flight_suffix = ".dbd"
@@ -82,16 +94,27 @@ def main(args):
                 flight_dir, flight_suffix, science_dir, sci_suffix, logging_base
             )
 
-            # copy files
+            # copy files, flight and science together, in threads so several copies are in flight at once
             try:
-                ffiles = [shutil.copy(f, binary_dir) for f in flight_files]
-                sfiles = [shutil.copy(f, binary_dir) for f in science_files]
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    copied = list(
+                        executor.map(
+                            cf.fast_copy,
+                            flight_files + science_files,
+                            repeat(binary_dir),
+                        )
+                    )
+                ffiles = copied[: len(flight_files)]
+                sfiles = copied[len(flight_files) :]
             except Exception as e:
-                logging_base.error(f"Error copying files: {e}")
+                logging_base.error("Error copying files: %s", e)
                 sys.exit(1)
 
             logging_base.info(
-                f"Copied {len(ffiles)} flight and {len(sfiles)} science files from to {binary_dir}"
+                "Copied %s flight and %s science files from to %s",
+                len(ffiles),
+                len(sfiles),
+                binary_dir,
             )
 
 
@@ -113,6 +136,14 @@ if __name__ == "__main__":
         action="store_true",
     )
 
+    arg_parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of files to copy at once",
+        type=int,
+        default=8,
+    )
+
     arg_parser.add_argument(
         "-l",
         "--loglevel",
@@ -15,22 +15,61 @@ Gets all of the sensor information from sensor_defs-raw.json and sensor_defs-sci
 Writes the deployment.yml file that is used to convert raw glider data files to trajectory .nc files
 """
 
+import copy
 import os
 import argparse
 import sys
+from functools import lru_cache
 import yaml
-import json
 import sbuglider.common as cf
 from sbuglider.loggers import logfile_basename, setup_logger, logfile_deploymentname
 
+# parse JSON with orjson when it is installed
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
-def is_sensor_listed_as_source(sensor, template_data):
-    # Check if the sensor is listed as a source in netcdf_variables
-    netcdf_variables = template_data.get("netcdf_variables", {})
-    for var, attributes in netcdf_variables.items():
-        if attributes.get("source") == sensor:
-            return True
-    return False
+# parse and write YAML with libyaml when PyYAML was built with it
+try:
+    from yaml import CSafeDumper as _YAMLDumper, CSafeLoader as _YAMLLoader
+except ImportError:
+    from yaml import SafeDumper as _YAMLDumper, SafeLoader as _YAMLLoader
+
+# sensor_defs attributes that are copied into deployment.yml
+_SENSOR_ATTRS = frozenset(
+    {
+        "axis",
+        "units",
+        "long_name",
+        "standard_name",
+        "valid_min",
+        "valid_max",
+        "fill_value",
+    }
+)
+
+
+# deployments of the same glider usually share copies of the same config files, so the parsed
+# contents are cached by the file's bytes and reused across deployments
+@lru_cache(maxsize=64)
+def _parse_yaml(content: bytes):
+    return yaml.load(content, Loader=_YAMLLoader)
+
+
+@lru_cache(maxsize=64)
+def _parse_json(content: bytes):
+    return _json_loads(content)
+
+
+def _load_yaml(file):
+    """Parses a YAML file opened in binary mode, returning a copy that can be modified."""
+    return copy.deepcopy(_parse_yaml(file.read()))
+
+
+def _load_json(file):
+    """Parses a JSON file opened in binary mode. The result is shared, so it must not be modified."""
+    return _parse_json(file.read())
 
 
 def main(args):
@@ -77,9 +116,10 @@ def main(args):
                 deployment_config_root, "deployment-template.yml"
             )
             if os.path.isfile(templatefile):
-                with open(templatefile, "r") as file:
+                with open(templatefile, "rb") as file:
                     try:
-                        template_data = yaml.safe_load(file)  # Parse the YAML file
+                        # Parse the YAML file
+                        template_data = _load_yaml(file)
                     except yaml.YAMLError as e:
                         logging.error(f"Error reading YAML file {templatefile}: {e}")
                         continue
@@ -93,11 +133,10 @@ def main(args):
                 deployment_config_root, "deployment-globalattrs.yml"
             )
             if os.path.isfile(globalattrsfile):
-                with open(globalattrsfile, "r") as file:
+                with open(globalattrsfile, "rb") as file:
                     try:
-                        deployment_global_attrs = yaml.safe_load(
-                            file
-                        )  # Parse the YAML file
+                        # Parse the YAML file
+                        deployment_global_attrs = _load_yaml(file)
                         if "metadata" in template_data.keys():
                             template_data["metadata"].update(deployment_global_attrs)
                         else:
@@ -115,9 +154,10 @@ def main(args):
             template_data["platform"] = dict()
             platformfile = os.path.join(deployment_config_root, "platform.yml")
             if os.path.isfile(platformfile):
-                with open(platformfile, "r") as file:
+                with open(platformfile, "rb") as file:
                     try:
-                        platform_metadata = yaml.safe_load(file)  # Parse the YAML file
+                        # Parse the YAML file
+                        platform_metadata = _load_yaml(file)
                         if "platform" in template_data.keys():
                             template_data["platform"].update(
                                 platform_metadata["platform"]
@@ -148,8 +188,8 @@ def main(args):
             # find and open instruments.json
             instrumentsfile = os.path.join(deployment_config_root, "instruments.json")
             if os.path.isfile(instrumentsfile):
-                with open(instrumentsfile, "r") as file:
-                    instruments = json.load(file)
+                with open(instrumentsfile, "rb") as file:
+                    instruments = _load_json(file)
             else:
                 logging.error(f"instruments.json file not found: {instrumentsfile}")
                 continue
@@ -166,10 +206,10 @@ def main(args):
             sdprofile = os.path.join(
                 deployment_config_root, "sensor_defs-sci_profile.json"
             )
-            with open(sdraw, "r") as file:
-                sdraw_data = json.load(file)
-            with open(sdprofile, "r") as file:
-                sdprofile_data = json.load(file)
+            with open(sdraw, "rb") as file:
+                sdraw_data = _load_json(file)
+            with open(sdprofile, "rb") as file:
+                sdprofile_data = _load_json(file)
             combined_data = sdraw_data.copy()
             combined_data.update(sdprofile_data)
 
@@ -186,12 +226,17 @@ def main(args):
                 continue
 
             # add all of the variables from sensors.txt to template_data['netcdf_variables']
+            # sources already listed in netcdf_variables
+            existing_sources = {
+                attributes.get("source")
+                for attributes in template_data.get("netcdf_variables", {}).values()
+            }
             for sensor in sensors:
                 # Check if the sensor is listed as a source in netcdf_variables
-                check = is_sensor_listed_as_source(sensor, template_data)
-                if check:
+                if sensor in existing_sources:
                     continue  # it's already in deployment.yml so skip this variable
                 else:
+                    existing_sources.add(sensor)
                     # find the variable information in sensor_defs and add to the deployment.yml file
                     try:
                         sensor_info = combined_data[sensor]
@@ -199,15 +244,7 @@ def main(args):
                         template_data["netcdf_variables"][keyname] = {}
                         template_data["netcdf_variables"][keyname]["source"] = sensor
                         for key, value in sensor_info["attrs"].items():
-                            if key in [
-                                "axis",
-                                "units",
-                                "long_name",
-                                "standard_name",
-                                "valid_min",
-                                "valid_max",
-                                "fill_value",
-                            ]:
+                            if key in _SENSOR_ATTRS:
                                 template_data["netcdf_variables"][keyname][key] = value
                     except KeyError:
                         template_data["netcdf_variables"][sensor] = {}
@@ -220,7 +257,14 @@ def main(args):
             deploymentyaml = os.path.join(deployment_config_root, "deployment.yml")
             with open(deploymentyaml, "w") as outfile:
                 try:
-                    yaml.dump(template_data, outfile, default_flow_style=False)
+                    # keys are written in insertion order, so the file follows the template layout
+                    yaml.dump(
+                        template_data,
+                        outfile,
+                        Dumper=_YAMLDumper,
+                        default_flow_style=False,
+                        sort_keys=False,
+                    )
                     logging.info(
                         f"Successfully wrote deployment.yml file: {deploymentyaml}"
                     )
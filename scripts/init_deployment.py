@@ -1,14 +1,16 @@
 #!/user/bin/env python
 
 import argparse
-from dateutil import parser
+from datetime import datetime, timezone
 import os
-import pytz
 import re
 import sys
 
 from sbuglider.loggers import logfile_basename, setup_logger
 
+# deployment names are formatted as glider-YYYYmmddTHHMM
+_GLIDER_RE = re.compile(r"^(.*)-(\d{8}T\d{4})")
+
 
 def main(args):
     """Initialize glider deployment(s)."""
@@ -19,8 +21,6 @@ def main(args):
     logfile_base = logfile_basename()
     logging_base = setup_logger("logging_base", loglevel, logfile_base)
 
-    glider_regex = re.compile(r"^(.*)-(\d{8}T\d{4})")
-
     # find the glider deployments root directory
     data_home = os.getenv("GLIDER_DATA_HOME")
 
@@ -36,11 +36,13 @@ def main(args):
     # create the deployment directory
     for deployment in deployments:
         deployment_root = os.path.join(data_home, "deployments")
-        match = glider_regex.search(deployment)
+        match = _GLIDER_RE.match(deployment)
         if match:
             glider, trajectory = match.groups()
             try:
-                trajectory_dt = parser.parse(trajectory).replace(tzinfo=pytz.UTC)
+                trajectory_dt = datetime.strptime(trajectory, "%Y%m%dT%H%M").replace(
+                    tzinfo=timezone.utc
+                )
             except ValueError as e:
                 logging_base.error(
                     "Error parsing trajectory date {:s}: {:}".format(trajectory, e)
@@ -63,16 +65,22 @@ def main(args):
             rt_dir = os.path.join(deployment_dir, "data", "out", "rt", "qc_queue")
             proclog_dir = os.path.join(deployment_dir, "proc-logs")
 
-            # create the deployment subdirectories
+            subdirs = (
+                config_dir,
+                bin_stbd_dir,
+                bin_debd_dir,
+                raw_stbd_dir,
+                raw_debd_dir,
+                delayed_dir,
+                rt_dir,
+                proclog_dir,
+            )
+
+            # create the deployment subdirectories, shortest paths first so the shared parent
+            # directories already exist by the time the deeper ones are made
             try:
-                os.makedirs(config_dir, exist_ok=True)
-                os.makedirs(bin_stbd_dir, exist_ok=True)
-                os.makedirs(bin_debd_dir, exist_ok=True)
-                os.makedirs(raw_stbd_dir, exist_ok=True)
-                os.makedirs(raw_debd_dir, exist_ok=True)
-                os.makedirs(delayed_dir, exist_ok=True)
-                os.makedirs(rt_dir, exist_ok=True)
-                os.makedirs(proclog_dir, exist_ok=True)
+                for subdir in sorted(set(subdirs), key=len):
+                    os.makedirs(subdir, exist_ok=True)
             except OSError as e:
                 logging_base.error(f"Error creating deployment subdirectories: {e}")
                 sys.exit(1)
@@ -7,28 +7,61 @@ Convert raw DBD/EBD or SBD/TBD netCDF files from
 Slocum gliders to merged timeseries netCDF files using pyglider.
 """
 
+import copy
 import os
 import argparse
 import sys
-import glob
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 import yaml
-import xarray as xr
-import numpy as np
-from netCDF4 import default_fillvals
-import pyglider.slocum as slocum
 import sbuglider.common as cf
-from sbuglider.loggers import logfile_basename, setup_logger, logfile_deploymentname
+from sbuglider.loggers import (
+    close_logger,
+    flush_logger,
+    logfile_basename,
+    logfile_deploymentname,
+    setup_logger,
+)
+
+# parse YAML with libyaml when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as _YAMLLoader
+
+# target size in bytes of each netcdf variable chunk
+CHUNK_BYTES = 256 * 1024
 
 
 def add_profile_vars(dataset, add_var, profile_meta, template_var="profile_id"):
-    v = np.zeros(np.shape(dataset[template_var]))
-    if np.any(dataset[template_var] != 0):
+    import numpy as np
+    import xarray as xr
+
+    ids = dataset[template_var].values
+    v = np.zeros(np.shape(ids))
+
+    # samples outside of a profile have an id of 0 (or NaN) and are left as 0
+    in_profile = ids != 0
+    if ids.dtype.kind == "f":
+        in_profile &= ~np.isnan(ids)
+
+    if np.any(in_profile):
         sourcevar = profile_meta[add_var]["source"]
-        unique_ids = np.unique(dataset[template_var].values)
-        for i in unique_ids:
-            if i != 0:
-                idx = np.where(dataset[template_var] == i)[0]
-                v[idx] = np.nanmean(dataset[sourcevar].values[idx])
+        values = dataset[sourcevar].values[in_profile]
+
+        # nanmean of each profile in one pass: sum and count the non-NaN values per profile id
+        unique_ids, profile_index = np.unique(ids[in_profile], return_inverse=True)
+        finite = ~np.isnan(values)
+        sums = np.bincount(
+            profile_index,
+            weights=np.where(finite, values, 0.0),
+            minlength=unique_ids.size,
+        )
+        counts = np.bincount(profile_index, weights=finite, minlength=unique_ids.size)
+
+        # profiles without any valid values are NaN, as with nanmean
+        with np.errstate(invalid="ignore"):
+            v[in_profile] = (sums / counts)[profile_index]
 
     da = xr.DataArray(
         v,
@@ -41,36 +74,219 @@ def add_profile_vars(dataset, add_var, profile_meta, template_var="profile_id"):
     dataset[add_var] = da
 
 
-def build_encoding(encoding_dict, ds, variable):
-    # set the fill value using netCDF4.default_fillvals
-    if variable == "time":
-        encoding_dict[variable] = {
-            "zlib": True,
-            "complevel": 1,
-            "dtype": np.float64,
+@lru_cache(maxsize=2)
+def netcdf_compression(zstd=False) -> dict:
+    # compress with zlib level 1, which every netCDF-4 reader can open. zstd is opt-in: readers
+    # without the HDF5 zstd filter plugin (older netCDF-C, many ERDDAP/THREDDS installs,
+    # MATLAB) can't open those files at all. It is used when requested, netCDF4 supports it and
+    # the filter plugin can be loaded, which is checked once by writing a small in-memory file
+    import netCDF4
+
+    if zstd and getattr(netCDF4, "__has_zstandard_support__", 0):
+        try:
+            with netCDF4.Dataset(
+                "zstd_check.nc", "w", diskless=True, persist=False
+            ) as nc:
+                nc.createDimension("x", 1)
+                var = nc.createVariable(
+                    "x", "f8", ("x",), compression="zstd", complevel=3
+                )
+                var[:] = 0.0
+            return {"compression": "zstd", "complevel": 3}
+        except (RuntimeError, ValueError, OSError):
+            pass
+
+    return {"zlib": True, "complevel": 1}
+
+
+def chunk_encoding(shape, itemsize) -> dict:
+    # chunk along the first (time) dimension in blocks of about 256 KiB, so HDF5 compresses
+    # and reads each block separately instead of the whole variable at once. Scalar and
+    # empty variables are left unchunked
+    import numpy as np
+
+    if len(shape) == 0 or shape[0] == 0:
+        return {}
+    rows = max(1, CHUNK_BYTES // (itemsize * int(np.prod(shape[1:]))))
+    return {"chunksizes": (min(rows, shape[0]),) + tuple(shape[1:])}
+
+
+def build_encoding(ds, zstd=False) -> dict:
+    # set the fill value of each variable using netCDF4.default_fillvals
+    from netCDF4 import default_fillvals
+
+    compression = netcdf_compression(zstd)
+    encoding = {
+        v: {
+            **compression,
+            "dtype": ds[v].dtype,
+            "_FillValue": default_fillvals[f"{ds[v].dtype.kind}{ds[v].dtype.itemsize}"],
+            **chunk_encoding(ds[v].shape, ds[v].dtype.itemsize),
+        }
+        for v in (*ds.data_vars, *ds.coords)
+        if v != "time"
+    }
+
+    # time is written as float64, so size its chunks from the encoded dtype
+    if "time" in ds.variables:
+        encoding["time"] = {
+            **compression,
+            "dtype": "float64",
             "_FillValue": default_fillvals["f8"],
             "units": "seconds since 1970-01-01T00:00:00Z",
             "calendar": "gregorian",
-        }
-    else:
-        encoding_type = f"{ds[variable].dtype.kind}{ds[variable].dtype.itemsize}"
-        encoding_dict[variable] = {
-            "zlib": True,
-            "complevel": 1,
-            "dtype": ds[variable].dtype,
-            "_FillValue": default_fillvals[encoding_type],
+            **chunk_encoding(ds["time"].shape, 8),
         }
 
+    return encoding
 
-def convert_to_decimal_degrees(nmea_values):
+
+def convert_to_decimal_degrees(nmea_values, out=None):
     # convert NMEA lat/lon format (DDMM.MMMM) to decimal degrees (DD.DDDDDD)
-    # Extract degrees and minutes
-    degrees = nmea_values // 100  # Get the integer part (degrees)
-    minutes = nmea_values % 100  # Get the fractional part (minutes)
+    # Extract degrees (integer part) and minutes (fractional part) in one pass. The minutes
+    # are written to out when it is given (which may be nmea_values, to convert in place)
+    import numpy as np
+
+    degrees, minutes = np.divmod(nmea_values, 100.0, out=(None, out))
+
+    # Convert to decimal degrees, reusing the two arrays instead of allocating new ones
+    minutes /= 60
+    minutes += degrees
+    return minutes
+
+
+def write_csv(ds, outcsv):
+    # write the timeseries columns straight to a gzipped csv file, without building
+    # the indexed DataFrame that ds.to_dataframe() makes. pandas writes the csv either way, so
+    # the format is the same as the to_dataframe() dump
+    import numpy as np
+    import pandas as pd
+
+    # only time series and scalar variables can be written as columns, anything with other
+    # dimensions goes through the DataFrame, which expands it over all of its dimensions
+    if any(ds[v].dims not in ((), ("time",)) for v in ds.variables if v not in ds.dims):
+        ds.to_dataframe().to_csv(outcsv, compression="gzip", chunksize=100_000)
+        return
+
+    n = ds.sizes["time"]
+    cols = {"time": ds["time"].values}
+    for v in ds.variables:
+        if v not in ds.dims:
+            # scalar metadata variables (platform, instruments) are repeated on every row
+            cols[v] = np.broadcast_to(ds[v].values, (n,))
+
+    pd.DataFrame(cols, copy=False).to_csv(
+        outcsv, index=False, compression="gzip", chunksize=100_000
+    )
+
+
+# parsed deployment yaml files, keyed by the paths and modification times of the files
+_deployment_cache = {}
+
+
+def _cache_pyglider_deployment():
+    # pyglider parses deployment.yml again for every segment it merges, so wrap its loader to
+    # parse each file once and hand out copies (if this version of pyglider has the loader)
+    import pyglider.utils as pgutils
+
+    get_deployment = getattr(pgutils, "_get_deployment", None)
+    if get_deployment is None or getattr(get_deployment, "_cached", False):
+        return
+
+    def cached_get_deployment(deploymentyaml):
+        paths = [deploymentyaml] if isinstance(deploymentyaml, str) else deploymentyaml
+        key = tuple((path, os.stat(path).st_mtime_ns) for path in paths)
+        if key not in _deployment_cache:
+            _deployment_cache[key] = get_deployment(deploymentyaml)
+        return copy.deepcopy(_deployment_cache[key])
+
+    cached_get_deployment._cached = True
+    pgutils._get_deployment = cached_get_deployment
+
+
+def _init_segment_worker():
+    # parse deployment.yml once in each worker process
+    _cache_pyglider_deployment()
+
+
+def _merge_segment(
+    seg,
+    rawncdir,
+    outdir,
+    deploymentyaml,
+    deployment_meta,
+    profile_filter_time,
+    dump_csv,
+    zstd,
+    logname,
+    loglevel,
+    logfile,
+) -> bool:
+    # merge the raw netcdf files of one segment into a timeseries netcdf file in a worker
+    # process, returning whether a file was written
+    import numpy as np
+    import xarray as xr
+    import pyglider.slocum as slocum
+
+    # log to the deployment proc-log, with a logger that is closed again once the segment is done
+    logging = setup_logger(logname, loglevel, logfile)
+    try:
+        logging.info("%s", seg)
+        ds, savefile = slocum.raw_segment_to_timeseries(
+            rawncdir,
+            outdir,
+            deploymentyaml,
+            logging,
+            profile_filt_time=profile_filter_time,
+            profile_min_time=60,
+            segment=seg,
+        )
+
+        if ds is None:
+            return False
+
+        # convert NMEA lat/lon format (DDMM.MMMM) to decimal degrees (DD.DDDDDD), in place
+        # since the segment's data is already in memory
+        for v in ("latitude", "longitude"):
+            values = ds[v].values
+            ds[v].values = convert_to_decimal_degrees(values, out=values)
+
+        # add profile_lat and profile_lon
+        add_profile_vars(ds, "profile_lat", deployment_meta["profile_variables"])
+        add_profile_vars(ds, "profile_lon", deployment_meta["profile_variables"])
+
+        # add the platform and instrument metadata variables in one assign. They are all
+        # empty scalars, so they share the same NaN array
+        scalar_nan = np.array(np.nan)
+        metadata_vars = {
+            "platform": xr.DataArray(
+                scalar_nan, name="platform", attrs=deployment_meta["platform"]
+            )
+        }
+        for ncvar_name, attributes in deployment_meta.get("instruments", {}).items():
+            metadata_vars[ncvar_name] = xr.DataArray(
+                scalar_nan, name=ncvar_name, attrs=attributes
+            )
+        ds = ds.assign(metadata_vars)
+
+        # add variable encoding
+        encoding = build_encoding(ds, zstd)
 
-    # Convert to decimal degrees
-    decimal_degrees = degrees + (minutes / 60)
-    return decimal_degrees
+        outname = os.path.join(outdir, savefile)
+        logging.info(f"Writing {outname}")
+        ds.to_netcdf(outname, "w", encoding=encoding)
+
+        # for testing
+        if dump_csv:
+            savefile = savefile.replace(".nc", ".csv.gz")
+            outcsv = os.path.join(outdir, savefile)
+            write_csv(ds, outcsv)
+
+        return True
+    finally:
+        # worker processes exit without running atexit, so write out the buffered log records
+        # and close the proc-log here
+        close_logger(logging)
 
 
 def main(args):
@@ -78,6 +294,9 @@ def main(args):
     loglevel = args.loglevel.upper()
     mode = args.mode
     test = args.test
+    dump_csv = args.dump_csv
+    zstd = args.zstd
+    segment_workers = args.segment_workers
     loglevel = loglevel.upper()
 
     # logFile_base = os.path.join(os.path.expanduser('~'), 'glider_proc_log')  # for debugging
@@ -85,6 +304,7 @@ def main(args):
     logging_base = setup_logger("logging_base", loglevel, logFile_base)
 
     data_home, deployments_root = cf.find_glider_deployments_rootdir(logging_base, test)
+    _cache_pyglider_deployment()
 
     if isinstance(deployments_root, str):
 
@@ -118,137 +338,112 @@ def main(args):
                 deployment, mode, "proc_merge_nc_to_timeseries"
             )
             logFile = os.path.join(deployment_location, "proc-logs", logfilename)
-            logging = setup_logger(__name__, loglevel, logFile)
-
-            # Set the deployment configuration path
-            deployment_config_root = os.path.join(deployment_location, "config", "proc")
-            if not os.path.isdir(deployment_config_root):
-                logging.warning(
-                    f"Invalid deployment config root: {deployment_config_root}"
-                )
-
-            # Find metadata file
-            deploymentyaml = os.path.join(deployment_config_root, "deployment.yml")
-            if os.path.isfile(deploymentyaml):
-                with open(deploymentyaml, "r") as file:
-                    try:
-                        deployment_meta = yaml.safe_load(file)  # Parse the YAML file
-                    except yaml.YAMLError as e:
-                        logging.error(f"Error reading YAML file {deploymentyaml}: {e}")
-                        continue
-            else:
-                logging.error(f"deployment.yaml file not found: {deploymentyaml}")
-                continue
-
-            if mode == "rt":
-                scisuffix = "tbd"
-                glidersuffix = "sbd"
-                profile_filter_time = 30
-            elif mode == "delayed":
-                scisuffix = "ebd"
-                glidersuffix = "dbd"
-                profile_filter_time = 30
-            else:
-                logging.warning(f"Invalid mode provided: {mode}")
-                continue
-
-            logging.info(f"Processing: {deployment} {mode}")
-
-            # make timeseries netcdf file from each debd.nc/stdb.nc pair
-            logging.info(
-                f"merging *.{scisuffix}.nc and *.{glidersuffix}.nc netcdf files into timeseries netcdf files"
-            )
-            logging.info(
-                f"Individual *.{scisuffix}.nc and *.{glidersuffix}.nc filepath: {rawncdir}"
-            )
-            logging.info(f"Timeseries output filepath: {outdir}")
-
-            files = glob.glob(os.path.join(rawncdir, "*.nc"))
-            segment_list = []
-            for file in files:
-                segment = os.path.basename(file).split(".")[0]
-                if segment not in segment_list:
-                    segment_list.append(segment)
-
-            # log the number of .nc files to be merged
-            scicount = len(
-                [f for f in os.listdir(rawncdir) if f.endswith(f".{scisuffix}.nc")]
-            )
-            flightcount = len(
-                [f for f in os.listdir(rawncdir) if f.endswith(f".{glidersuffix}.nc")]
-            )
-            logging.info(
-                f"Found {scicount} *.{scisuffix}.nc (science) and {flightcount} *.{glidersuffix}.nc (flight) files to merge"
-            )
+            logging = setup_logger(f"{__name__}.{deployment}", loglevel, logFile)
+            try:
 
-            for seg in sorted(segment_list):
-                print(seg)
-                ds, savefile = slocum.raw_segment_to_timeseries(
-                    rawncdir,
-                    outdir,
-                    deploymentyaml,
-                    logging,
-                    profile_filt_time=profile_filter_time,
-                    profile_min_time=60,
-                    segment=seg,
+                # Set the deployment configuration path
+                deployment_config_root = os.path.join(
+                    deployment_location, "config", "proc"
                 )
-
-                if ds is not None:
-                    # convert NMEA lat/lon format (DDMM.MMMM) to decimal degrees (DD.DDDDDD)
-                    ds["latitude"].values = convert_to_decimal_degrees(
-                        ds["latitude"].values
-                    )
-                    ds["longitude"].values = convert_to_decimal_degrees(
-                        ds["longitude"].values
+                if not os.path.isdir(deployment_config_root):
+                    logging.warning(
+                        f"Invalid deployment config root: {deployment_config_root}"
                     )
 
-                    # add profile_lat and profile_lon
-                    add_profile_vars(
-                        ds, "profile_lat", deployment_meta["profile_variables"]
-                    )
-                    add_profile_vars(
-                        ds, "profile_lon", deployment_meta["profile_variables"]
-                    )
+                # Find metadata file
+                deploymentyaml = os.path.join(deployment_config_root, "deployment.yml")
+                if os.path.isfile(deploymentyaml):
+                    with open(deploymentyaml, "r") as file:
+                        try:
+                            # Parse the YAML file
+                            deployment_meta = yaml.load(file, Loader=_YAMLLoader)
+                        except yaml.YAMLError as e:
+                            logging.error(
+                                f"Error reading YAML file {deploymentyaml}: {e}"
+                            )
+                            continue
+                else:
+                    logging.error(f"deployment.yaml file not found: {deploymentyaml}")
+                    continue
+
+                if mode == "rt":
+                    scisuffix = "tbd"
+                    glidersuffix = "sbd"
+                    profile_filter_time = 30
+                elif mode == "delayed":
+                    scisuffix = "ebd"
+                    glidersuffix = "dbd"
+                    profile_filter_time = 30
+                else:
+                    logging.warning(f"Invalid mode provided: {mode}")
+                    continue
+
+                logging.info(f"Processing: {deployment} {mode}")
+
+                # make timeseries netcdf file from each debd.nc/stdb.nc pair
+                logging.info(
+                    f"merging *.{scisuffix}.nc and *.{glidersuffix}.nc netcdf files into timeseries netcdf files"
+                )
+                logging.info(
+                    f"Individual *.{scisuffix}.nc and *.{glidersuffix}.nc filepath: {rawncdir}"
+                )
+                logging.info(f"Timeseries output filepath: {outdir}")
+
+                # find the segments and count the .nc files to be merged in one directory listing
+                segments = set()
+                scicount = 0
+                flightcount = 0
+                with os.scandir(rawncdir) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if not name.endswith(".nc"):
+                            continue
+                        segments.add(name.split(".")[0])
+                        if name.endswith(f".{scisuffix}.nc"):
+                            scicount += 1
+                        elif name.endswith(f".{glidersuffix}.nc"):
+                            flightcount += 1
+
+                # log the number of .nc files to be merged
+                logging.info(
+                    f"Found {scicount} *.{scisuffix}.nc (science) and {flightcount} *.{glidersuffix}.nc (flight) files to merge"
+                )
 
-                    # add platform metadata variable
-                    da = xr.DataArray(
-                        np.array(np.nan),
-                        name="platform",
-                        attrs=deployment_meta["platform"],
-                    )
-                    ds["platform"] = da
-
-                    # add instrument metadata variables
-                    for ncvar_name, attributes in deployment_meta.get(
-                        "instruments", {}
-                    ).items():
-                        da = xr.DataArray(
-                            np.array(np.nan), name=ncvar_name, attrs=attributes
-                        )
-                        ds[ncvar_name] = da
-
-                    # add variable encoding
-                    encoding = dict()
-                    for v in ds.data_vars:
-                        build_encoding(encoding, ds, v)
-
-                    for v in ds.coords:
-                        build_encoding(encoding, ds, v)
-
-                    outname = os.path.join(outdir, savefile)
-                    logging.info(f"Writing {outname}")
-                    ds.to_netcdf(outname, "w", encoding=encoding)
-
-                    # for testing
-                    savefile = savefile.replace(".nc", ".csv")
-                    outcsv = os.path.join(outdir, savefile)
-                    ds.to_dataframe().to_csv(outcsv)
-
-            # log how many files were successfully merged
-            outputcount = len([f for f in os.listdir(outdir) if f.endswith(".nc")])
-            logging.info(
-                f"Successfully created {outputcount} merged *.nc files (out of {scicount} *.{scisuffix}.nc files and {flightcount} *.{glidersuffix}.nc files)"
-            )
+                # segments are independent, so merge them in parallel. Write out the buffered log
+                # records first so that forked workers don't inherit and write them again
+                flush_logger(logging)
+                merge_segment = partial(
+                    _merge_segment,
+                    rawncdir=rawncdir,
+                    outdir=outdir,
+                    deploymentyaml=deploymentyaml,
+                    deployment_meta=deployment_meta,
+                    profile_filter_time=profile_filter_time,
+                    dump_csv=dump_csv,
+                    zstd=zstd,
+                    logname=logging.name,
+                    loglevel=loglevel,
+                    logfile=logFile,
+                )
+                outputcount = 0
+                if segments:
+                    # each worker holds a whole merged segment in memory, so the pool is capped at
+                    # the requested number of workers
+                    max_workers = max(1, min(len(segments), segment_workers))
+                    with ProcessPoolExecutor(
+                        max_workers=max_workers,
+                        initializer=_init_segment_worker,
+                    ) as executor:
+                        outputcount = sum(executor.map(merge_segment, sorted(segments)))
+
+                # log how many files were successfully merged
+                logging.info(
+                    f"Successfully created {outputcount} merged *.nc files (out of {scicount} *.{scisuffix}.nc files and {flightcount} *.{glidersuffix}.nc files)"
+                )
+            finally:
+                # close the proc-log so a run over many deployments doesn't keep a log file open
+                # for each of them
+                close_logger(logging)
 
 
 if __name__ == "__main__":
@@ -291,6 +486,26 @@ if __name__ == "__main__":
         action="store_true",
     )
 
+    arg_parser.add_argument(
+        "--dump-csv",
+        help="Also write each merged timeseries to a gzipped csv file, for testing.",
+        action="store_true",
+    )
+
+    arg_parser.add_argument(
+        "-sw",
+        "--segment_workers",
+        help="Number of segments to merge in parallel",
+        type=int,
+        default=4,
+    )
+
+    arg_parser.add_argument(
+        "--zstd",
+        help="Compress the merged timeseries with zstd instead of zlib, if the netCDF build supports it. Readers need the HDF5 zstd filter plugin to open the files.",
+        action="store_true",
+    )
+
     parsed_args = arg_parser.parse_args()
 
     sys.exit(main(parsed_args))
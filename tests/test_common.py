@@ -0,0 +1,178 @@
+import logging
+import os
+import shutil
+
+import pytest
+
+import sbuglider.common as cf
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "src.dbd"
+    path.write_bytes(os.urandom(300_000))
+    return path
+
+
+def test_fast_copy_to_directory(src, tmp_path):
+    outdir = tmp_path / "out"
+    outdir.mkdir()
+    dst = cf.fast_copy(str(src), str(outdir))
+    assert dst == str(outdir / "src.dbd")
+    assert (outdir / "src.dbd").read_bytes() == src.read_bytes()
+
+
+@pytest.mark.parametrize("link", [False, True])
+def test_fast_copy_same_file(src, tmp_path, link):
+    contents = src.read_bytes()
+    dst = tmp_path
+    if link:
+        # a symlinked directory that points back at the source directory
+        dst = tmp_path / "linked"
+        dst.symlink_to(tmp_path, target_is_directory=True)
+
+    with pytest.raises(shutil.SameFileError):
+        cf.fast_copy(str(src), str(dst))
+    assert src.read_bytes() == contents
+
+
+def test_fast_copy_short_kernel_copy(src, tmp_path, monkeypatch):
+    # a kernel copy that stops part way through but still reports success
+    def short_copy(infd, outfd, size):
+        os.write(outfd, os.read(infd, 1000))
+        return True
+
+    monkeypatch.setattr(cf, "_kernel_copy", short_copy)
+    dst = tmp_path / "dst.dbd"
+    cf.fast_copy(str(src), str(dst))
+    assert dst.read_bytes() == src.read_bytes()
+
+
+@pytest.mark.skipif(not os.path.isfile("/proc/version"), reason="no procfs")
+def test_fast_copy_zero_size_source(tmp_path):
+    # procfs files report a size of 0 but have contents
+    dst = tmp_path / "version"
+    cf.fast_copy("/proc/version", str(dst))
+    with open("/proc/version", "rb") as f:
+        assert dst.read_bytes() == f.read()
+
+
+def test_find_deployment_config_files(tmp_path, caplog):
+    config_root = tmp_path / "config" / "proc"
+    config_root.mkdir(parents=True)
+    (config_root / "deployment.yml").write_text("metadata: {}\n")
+
+    logger = logging.getLogger("test_find_deployment_config_files")
+    with caplog.at_level(logging.WARNING, logger=logger.name):
+        deploymentyaml, sensorlist = cf.find_deployment_config_files(
+            logger, str(tmp_path)
+        )
+
+    assert deploymentyaml == str(config_root / "deployment.yml")
+    assert sensorlist == str(config_root / "sensors.txt")
+    assert [r.getMessage() for r in caplog.records] == [
+        f"Invalid sensors.txt file: {sensorlist}"
+    ]
+
+
+def test_find_deployment_config_files_missing_root(tmp_path, caplog):
+    logger = logging.getLogger("test_find_deployment_config_files_missing_root")
+    with caplog.at_level(logging.WARNING, logger=logger.name):
+        cf.find_deployment_config_files(logger, str(tmp_path))
+
+    assert [r.getMessage().split(":")[0] for r in caplog.records] == [
+        "Invalid deployment config root",
+        "Invalid deployment.yaml file",
+        "Invalid sensors.txt file",
+    ]
+
+
+def test_list_files(tmp_path):
+    for name in ("a.dbd", "b.ebd", "._a.dbd"):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "c.dbd").mkdir()
+
+    assert cf.list_files(str(tmp_path), ".dbd") == [str(tmp_path / "a.dbd")]
+    assert sorted(cf.list_files(str(tmp_path))) == [
+        str(tmp_path / "a.dbd"),
+        str(tmp_path / "b.ebd"),
+    ]
+    assert cf.list_files(str(tmp_path / "missing"), ".dbd") == []
+
+
+def _zero_copy(infd, outfd, count):
+    return 0
+
+
+def _partial_copy(infd, outfd, count):
+    # copies the first 1000 bytes, then nothing
+    if os.lseek(infd, 0, os.SEEK_CUR) > 0:
+        return 0
+    return os.write(outfd, os.read(infd, min(count, 1000)))
+
+
+@pytest.mark.parametrize("kernel_copy", [_zero_copy, _partial_copy])
+def test_kernel_copy_short(src, tmp_path, kernel_copy, monkeypatch):
+    monkeypatch.setattr(cf, "_KERNEL_COPIES", [kernel_copy])
+    dst = tmp_path / "dst.dbd"
+    size = src.stat().st_size
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        assert not cf._kernel_copy(fsrc.fileno(), fdst.fileno(), size)
+        assert os.fstat(fdst.fileno()).st_size == 0
+
+    cf.fast_copy(str(src), str(dst))
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_kernel_copy_falls_back_to_next_method(src, tmp_path, monkeypatch):
+    calls = []
+
+    def read_write(infd, outfd, count):
+        calls.append(count)
+        return os.write(outfd, os.read(infd, count))
+
+    monkeypatch.setattr(cf, "_KERNEL_COPIES", [_partial_copy, read_write])
+    dst = tmp_path / "dst.dbd"
+    cf.fast_copy(str(src), str(dst))
+    assert calls
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def _count_files(logger, deployment, deployment_location, data_path, output_path, mode):
+    logger.info("converting %s", deployment)
+    return len(os.listdir(data_path))
+
+
+def test_convert_deployments(tmp_path, caplog):
+    deployments_root = tmp_path / "deployments"
+    for deployment in ("ru39-20250423T1535", "ru44-20250306T0038"):
+        location = deployments_root / "2025" / deployment
+        (location / "data" / "in" / "binary" / "debd").mkdir(parents=True)
+        (location / "data" / "in" / "rawnc" / "debd").mkdir(parents=True)
+        (location / "proc-logs").mkdir()
+        (location / "data" / "in" / "binary" / "debd" / "a.dbd").write_bytes(b"")
+    # no proc-logs directory
+    (deployments_root / "2025" / "ru44-20250306T0038" / "proc-logs").rmdir()
+
+    logger = logging.getLogger("test_convert_deployments")
+    with caplog.at_level(logging.ERROR, logger=logger.name):
+        jobs = cf.check_deployment_datapaths(
+            logger,
+            ["ru39-20250423T1535", "ru44-20250306T0038"],
+            str(deployments_root),
+            "delayed",
+            "rawnc",
+        )
+    assert [job[0] for job in jobs] == ["ru39-20250423T1535"]
+    assert [r.getMessage() for r in caplog.records] == [
+        "ru44-20250306T0038 deployment proc-logs directory not found"
+    ]
+
+    results = list(
+        cf.convert_deployments(_count_files, jobs, "proc_test", "delayed", "INFO", 2)
+    )
+    assert results == [("ru39-20250423T1535", 1)]
+    (logfile,) = (
+        deployments_root / "2025" / "ru39-20250423T1535" / "proc-logs"
+    ).iterdir()
+    assert "converting ru39-20250423T1535" in logfile.read_text()
@@ -0,0 +1,52 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from scripts.merge_raw_nc_to_timeseries import write_csv
+
+
+@pytest.fixture
+def ds():
+    time = pd.date_range("2025-04-23T15:35", periods=5, freq="s")
+    return xr.Dataset(
+        {
+            "temperature": ("time", np.arange(5.0)),
+            "platform": ((), np.nan, {"type": "platform"}),
+        },
+        coords={"time": time},
+    )
+
+
+def test_write_csv(ds, tmp_path):
+    outcsv = tmp_path / "ds.csv.gz"
+    write_csv(ds, str(outcsv))
+
+    df = pd.read_csv(outcsv, compression="gzip")
+    assert list(df.columns) == ["time", "temperature", "platform"]
+    np.testing.assert_array_equal(df["temperature"], ds["temperature"].values)
+    assert df["platform"].isna().all()
+
+
+def test_write_csv_multidimensional(ds, tmp_path):
+    ds["counts"] = (("time", "bin"), np.arange(10).reshape(5, 2))
+    outcsv = tmp_path / "ds.csv.gz"
+    write_csv(ds, str(outcsv))
+
+    df = pd.read_csv(outcsv, compression="gzip")
+    expected = ds.to_dataframe().reset_index()
+    assert len(df) == len(expected) == 10
+    np.testing.assert_array_equal(df["counts"], expected["counts"])
+    np.testing.assert_array_equal(df["temperature"], expected["temperature"])
+
+
+def test_write_csv_matches_to_dataframe(ds, tmp_path):
+    outcsv = tmp_path / "ds.csv.gz"
+    expected = tmp_path / "expected.csv.gz"
+    write_csv(ds, str(outcsv))
+    ds.to_dataframe().to_csv(str(expected), compression="gzip")
+
+    with gzip.open(outcsv) as f, gzip.open(expected) as e:
+        assert f.read() == e.read()